@@ -53,7 +53,7 @@ class Automation:
     def _setDCSync(self, rel):
         user = rel['start_node']['distinguishedname']
         modules.setDCSync(user)
-        self.dirty_laundry.append({'f':modules.setDCSync, 'args':[user,'False']})
+        self.dirty_laundry.append({'f':modules.setDCSync, 'args':[user,False]})
     
     def _ownerDomain(self, rel):
         self._setOwner(rel)
@@ -100,7 +100,7 @@ class Automation:
         user = rel['start_node']['distinguishedname']
         target = rel['end_node']['distinguishedname']
         modules.setGenericAll(self.conn, user, target)
-        self.dirty_laundry.append({'f':modules.setGenericAll, 'args':[user,target,'False']})
+        self.dirty_laundry.append({'f':modules.setGenericAll, 'args':[user,target,False]})
     
     def _setOwner(self, rel):
         user = rel['start_node']['distinguishedname']
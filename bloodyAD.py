@@ -5,6 +5,14 @@ import argparse
 from bloodyAD import functions, ConnectionHandler
 
 
+def str2bool(value):
+    if value.lower() in ('true', 'yes', '1'):
+        return True
+    if value.lower() in ('false', 'no', '0'):
+        return False
+    raise ValueError(f"Boolean value expected (True or False), got '{value}'")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Active Directory Privilege Escalation Framework', formatter_class=argparse.RawTextHelpFormatter)
 
@@ -22,7 +30,7 @@ def main():
     # Find list of functions and their arguments in ldap.py
     # And add them all as subparsers
     subparsers = parser.add_subparsers(title="Commands", help='Function to call')
-    for name, f in functions:
+    for name, f in functions.items():
         subparser = subparsers.add_parser(name, prog=f.__doc__)
         subparser.add_argument('func_args', nargs='*')
         subparser.set_defaults(func=f)
@@ -45,9 +53,19 @@ def main():
 
     params = {param_names[i]: param_values[i] for i in range(len(param_values))}
 
+    # Convert the parameters having a boolean default value
+    param_defaults = args.func.__defaults__ or ()
+    param_defaults = dict(zip(param_names[len(param_names) - len(param_defaults):], param_defaults))
+    for name, value in params.items():
+        if isinstance(param_defaults.get(name), bool):
+            try:
+                params[name] = str2bool(value)
+            except ValueError as e:
+                parser.error(str(e))
+
     # Launch the command
-    conn = ConnectionHandler(args=args)
-    args.func(conn, **params)
+    with ConnectionHandler(args=args) as conn:
+        args.func(conn, **params)
 
 
 if __name__ == '__main__':
@@ -3,8 +3,10 @@ import ssl
 from impacket.dcerpc.v5 import transport, samr
 from impacket.dcerpc.v5 import rpcrt
 from dataclasses import dataclass
+from functools import cached_property
 
 from .formatters import formatFunctionalLevel, formatGMSApass, formatSD, formatSchemaVersion, formatAccountControl
+from .utils import resolvDN, getDefaultNamingContext
 
 @dataclass
 class Config:
@@ -23,6 +25,7 @@ class Config:
     url: str = ""
 
     def __post_init__(self):
+        self.scheme = self.scheme.lower()
 
         # Handle case where password is hashes
         if self.password and ':' in self.password:
@@ -60,7 +63,14 @@ class ConnectionHandler():
 
         self.conf = cnf
         self.samr = None
-        self.ldap = None
+        self._dn_cache = {}
+        self._naming_context = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def getSamrConnection(self):
         if not self.samr:
@@ -83,9 +93,11 @@ class ConnectionHandler():
         dce.bind(samr.MSRPC_UUID_SAMR)
         return dce
 
+    @cached_property
+    def ldap(self):
+        return self._connectLDAP()
+
     def getLdapConnection(self):
-        if not self.ldap:
-            self.ldap = self._connectLDAP()
         return self.ldap
 
     def _connectLDAP(self):
@@ -134,6 +146,29 @@ class ConnectionHandler():
             c.bind()
 
         return c
+
+    def resolvDN(self, identity, objtype=None):
+        """
+        Same as utils.resolvDN but results are cached for the lifetime of the LDAP connection
+        """
+        key = (identity, objtype)
+        if key not in self._dn_cache:
+            self._dn_cache[key] = resolvDN(self.ldap, identity, objtype)
+        return self._dn_cache[key]
+
+    def forgetDN(self, identity):
+        """
+        Drop the cached entries resolving from or to identity
+        """
+        identity = identity.lower()
+        for key, dn in list(self._dn_cache.items()):
+            if key[0].lower() == identity or dn.lower() == identity:
+                del self._dn_cache[key]
+
+    def getDefaultNamingContext(self):
+        if not self._naming_context:
+            self._naming_context = getDefaultNamingContext(self.ldap)
+        return self._naming_context
     
     def close(self):
         self._closeSamr()
@@ -145,14 +180,16 @@ class ConnectionHandler():
             self.samr = None
     
     def _closeLdap(self):
-        if self.ldap:
+        if 'ldap' in self.__dict__:
             self.ldap.unbind()
-            self.ldap = None
+            del self.ldap
+        self._dn_cache = {}
+        self._naming_context = None
 
     def switchUser(self, username, password):
         self.conf.username = username
         self.conf.password = password
-        if self.ldap:
+        if 'ldap' in self.__dict__:
             self.ldap.rebind(user='%s\\%s' % (self.conf.domain, username), password=password, authentication=ldap3.NTLM)
         self._closeSamr()
 
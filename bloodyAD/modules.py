@@ -1,15 +1,19 @@
 import ldap3
-import types
 import re
-import json
 from .addcomputer import ADDCOMPUTER
 from functools import wraps
+from dataclasses import dataclass
 
 from ldap3.extend.microsoft import addMembersToGroups, modifyPassword, removeMembersFromGroups
 from impacket.dcerpc.v5 import dtypes
 
+try:
+    import orjson as json
+except ImportError:
+    import json
+
 from .exceptions import BloodyError, ResultError, NoResultError
-from .utils import resolvDN, getDefaultNamingContext, getObjAttr, setAttr
+from .utils import getObjAttr, setAttr
 from .utils import rpcChangePassword
 from .utils import modifySecDesc
 from .utils import addShadowCredentials, delShadowCredentials
@@ -17,11 +21,16 @@ from .utils import LOG
 from .formatters import ACCESS_FLAGS
 
 
-functions = []
+functions = {}
+
+# Markers of a DN, SID or GUID identity (anything else is a sAMAccountName)
+_ID_MARKER_RE = re.compile(r'dc=|s-1|\{', re.IGNORECASE)
+# A DC host containing letters is a hostname, otherwise an IP
+_HOST_ALPHA_RE = re.compile(r'[a-zA-Z]')
 
 
 def register_module(f):
-    functions.append((f.__name__, f))
+    functions[f.__name__] = f
 
     @wraps(f)
     def wrapper(*args, **kwds):
@@ -31,7 +40,7 @@ def register_module(f):
 
 
 @register_module
-def getObjectAttributes(conn, identity, attr='*', fetchSD="False"):
+def getObjectAttributes(conn, identity, attr='*', fetchSD=False):
     """
     Fetch LDAP attributes for the identity (group or user) provided
     Args:
@@ -65,29 +74,51 @@ def addUser(conn, sAMAccountName, password, ou=None):
         identity: sAMAccountName, DN, GUID or SID of the target
         password: the password that will be set for the user account
     """
-    ldap_conn = conn.getLdapConnection()
+    ldap_conn = conn.ldap
 
     if ou:
         user_dn = f"cn={sAMAccountName},{ou}"
     else:
-        naming_context = getDefaultNamingContext(ldap_conn)
+        naming_context = conn.getDefaultNamingContext()
         user_dn = f"cn={sAMAccountName},cn=Users,{naming_context}"
 
-    user_cls = ['top', 'person', 'organizationalPerson', 'user']
-    attr = {'objectClass': user_cls}
-    attr["distinguishedName"] = user_dn
-    attr["sAMAccountName"] = sAMAccountName
-    attr["userAccountControl"] = 544
+    attr = {
+        'objectClass': ['top', 'person', 'organizationalPerson', 'user'],
+        'distinguishedName': user_dn,
+        'sAMAccountName': sAMAccountName,
+        'userAccountControl': 544
+    }
 
     ldap_conn.add(user_dn, attributes=attr)
+    conn.forgetDN(sAMAccountName)
 
     if ldap_conn.result['description'] == 'success':
         changePassword(conn, sAMAccountName, password)
     else:
-        LOG.error(sAMAccountName + ': ' + ldap_conn.result['description'])
+        LOG.error('%s: %s', sAMAccountName, ldap_conn.result['description'])
         raise BloodyError(ldap_conn.result['description'])
 
 
+@dataclass
+class AddComputerOptions:
+    """Command line options expected by ADDCOMPUTER"""
+    hashes: str = None
+    aesKey: str = None
+    k: bool = False
+    kdc_host: str = None
+    dc_host: str = None
+    dc_ip: str = None
+    computer_name: str = None
+    computer_pass: str = None
+    method: str = "SAMR"
+    port: int = None
+    domain_netbios: str = None
+    no_add: bool = None
+    delete: bool = None
+    baseDN: str = None
+    computer_group: str = None
+
+
 @register_module
 def addComputer(conn, hostname, password, ou=None):
     """
@@ -100,20 +131,17 @@ def addComputer(conn, hostname, password, ou=None):
         ou: Optional parameters - Where to put the computer object in the LDAP directory
     """
     cnf = conn.conf
-    if re.search('[a-zA-Z]', cnf.host):
+    if _HOST_ALPHA_RE.search(cnf.host):
         dc_host = cnf.host
         dc_ip = None
     else:
         dc_host = None
         dc_ip = cnf.host
-    options = types.SimpleNamespace(
+    options = AddComputerOptions(
         hashes=f'{cnf.lmhash}:{cnf.nthash}' if cnf.nthash else None,
-        aesKey=None, k=cnf.kerberos, kdc_host=None,
-        dc_host=dc_host, dc_ip=dc_ip,
+        k=cnf.kerberos, dc_host=dc_host, dc_ip=dc_ip,
         computer_name=hostname, computer_pass=password,
-        method='LDAPS' if cnf.scheme.lower() == 'ldaps' else 'SAMR',
-        port=None, domain_netbios=None,
-        no_add=None, delete=None, baseDN=None,
+        method='LDAPS' if cnf.scheme == 'ldaps' else 'SAMR',
         computer_group=ou)
     ADDCOMPUTER(cnf.username, cnf.password, cnf.domain, options).run()
 
@@ -125,11 +153,12 @@ def delObject(conn, identity):
     Args:
         identity: sAMAccountName, DN, GUID or SID of the target
     """
-    ldap_conn = conn.getLdapConnection()
-    dn = resolvDN(ldap_conn, identity)
-    LOG.debug(f"Trying to remove {dn}")
+    ldap_conn = conn.ldap
+    dn = conn.resolvDN(identity)
+    LOG.debug("Trying to remove %s", dn)
     ldap_conn.delete(dn)
-    LOG.info(f"[+] {dn} has been removed")
+    conn.forgetDN(dn)
+    LOG.info("[+] %s has been removed", dn)
 
 
 @register_module
@@ -140,8 +169,8 @@ def changePassword(conn, identity, new_pass):
         identity: sAMAccountName, DN, GUID or SID of the target (You must have write permission on it)
         new_pass: new password for the target
     """
-    ldap_conn = conn.getLdapConnection()
-    target_dn = resolvDN(ldap_conn, identity)
+    ldap_conn = conn.ldap
+    target_dn = conn.resolvDN(identity)
 
     # If LDAPS is not supported use SAMR
     if conn.conf.scheme == "ldaps":
@@ -153,15 +182,13 @@ def changePassword(conn, identity, new_pass):
     else:
         # Check if identity is sAMAccountName
         sAMAccountName = identity
-        for marker in ["dc=", "s-1", "{"]:
-            if marker in identity.lower():
-                ldap_filter = '(objectClass=*)'
-                ldap_conn.search(target_dn, ldap_filter, search_scope=ldap3.BASE, attributes=['SAMAccountName'])
-                try:
-                    sAMAccountName = ldap_conn.response[0]['attributes']['sAMAccountName']
-                except IndexError:
-                    raise NoResultError(target_dn, ldap_filter)
-                break
+        if _ID_MARKER_RE.search(identity):
+            ldap_filter = '(objectClass=*)'
+            ldap_conn.search(target_dn, ldap_filter, search_scope=ldap3.BASE, attributes=['SAMAccountName'])
+            try:
+                sAMAccountName = ldap_conn.response[0]['attributes']['sAMAccountName']
+            except IndexError:
+                raise NoResultError(target_dn, ldap_filter)
 
         rpcChangePassword(conn, sAMAccountName, new_pass)
 
@@ -173,13 +200,13 @@ def addObjectToGroup(conn, member, group):
         member: sAMAccountName, DN, GUID or SID of the object to add to the group
         group: DN, GUID or SID of the group
     """
-    ldap_conn = conn.getLdapConnection()
-    member_dn = resolvDN(ldap_conn, member)
-    LOG.debug(f"[+] {member} found at {member_dn}")
-    group_dn = resolvDN(ldap_conn, group)
-    LOG.debug(f"[+] {group} found at {group_dn}")
+    ldap_conn = conn.ldap
+    member_dn = conn.resolvDN(member)
+    LOG.debug("[+] %s found at %s", member, member_dn)
+    group_dn = conn.resolvDN(group)
+    LOG.debug("[+] %s found at %s", group, group_dn)
     addMembersToGroups.ad_add_members_to_groups(ldap_conn, member_dn, group_dn, raise_error=True)
-    LOG.info(f"[+] Adding {member_dn} to {group_dn}")
+    LOG.info("[+] Adding %s to %s", member_dn, group_dn)
 
 
 @register_module
@@ -190,7 +217,7 @@ def addForeignObjectToGroup(conn, user_sid, group_dn):
         user_sid: foreign object sid
         group_dn: group DN in which to add the foreign object
     """
-    ldap_conn = conn.getLdapConnection()
+    ldap_conn = conn.ldap
     # https://social.technet.microsoft.com/Forums/en-US/6b7217e1-a197-4e24-9357-351c2d23edfe/ldap-query-to-add-foreignsecurityprincipals-to-a-group?forum=winserverDS
     magic_user_dn = f"<SID={user_sid}>"
     addMembersToGroups.ad_add_members_to_groups(ldap_conn, magic_user_dn, group_dn, raise_error=True)
@@ -204,9 +231,9 @@ def delObjectFromGroup(conn, member, group):
         member: sAMAccountName, DN, GUID or SID of the object to delete from the group
         group: DN, GUID or SID of the group
     """
-    ldap_conn = conn.getLdapConnection()
-    member_dn = resolvDN(ldap_conn, member)
-    group_dn = resolvDN(ldap_conn, group)
+    ldap_conn = conn.ldap
+    member_dn = conn.resolvDN(member)
+    group_dn = conn.resolvDN(group)
     removeMembersFromGroups.ad_remove_members_from_groups(ldap_conn, member_dn, group_dn, True, raise_error=True)
 
 
@@ -218,15 +245,18 @@ def getChildObjects(conn, parent_obj, object_type='*'):
         base_obj: DN of the targeted parent object
         object_type: the type of object to fetch (user/computer or * to have them all)
     """
-    ldap_conn = conn.getLdapConnection()
-    ldap_conn.search(parent_obj, f'(objectClass={object_type})')
-    res = [entry['dn'] for entry in ldap_conn.response if entry['type'] == 'searchResEntry']
-    for child in res:
-        LOG.info(child)
+    ldap_conn = conn.ldap
+    entries = ldap_conn.extend.standard.paged_search(parent_obj, f'(objectClass={object_type})', attributes=ldap3.NO_ATTRIBUTES, paged_size=1000, generator=True)
+    res = []
+    for entry in entries:
+        if entry['type'] != 'searchResEntry':
+            continue
+        LOG.info(entry['dn'])
+        res.append(entry['dn'])
     return res
 
 @register_module
-def setShadowCredentials(conn, identity, enable="True", outfilePath=None, deviceID=None):
+def setShadowCredentials(conn, identity, enable=True, outfilePath=None, deviceID=None):
     """
     Add or delete attribute allowing to authenticate as the user provided using a crafted certificate (Shadow Credentials)
     Args:
@@ -235,14 +265,14 @@ def setShadowCredentials(conn, identity, enable="True", outfilePath=None, device
         outfilePath: file path for the generated certificate (default is current path)
         deviceID: DeviceID of the shadow credentials to remove from the target object (default is all)
     """
-    if enable == "True":
+    if enable:
         addShadowCredentials(conn, identity, outfilePath)
     else:
         delShadowCredentials(conn, identity, deviceID)
 
 
 @register_module
-def setGenericAll(conn, identity, target, enable="True"):
+def setGenericAll(conn, identity, target, enable=True):
     """
     Give permission to an AD object to modify the properties of another object
     Args:
@@ -251,8 +281,8 @@ def setGenericAll(conn, identity, target, enable="True"):
         enable: True to add GenericAll for the user or False to remove it (default is True)
     """
     modifySecDesc(conn=conn, identity=identity, target=target, enable=enable, control_flag=dtypes.DACL_SECURITY_INFORMATION)
-    if enable == "True":
-        LOG.info(f'[+] {identity} can now write the attributes of {target}')
+    if enable:
+        LOG.info('[+] %s can now write the attributes of %s', identity, target)
 
 
 @register_module
@@ -264,12 +294,12 @@ def setOwner(conn, identity, target):
         target: sAMAccountName, DN, GUID or SID of the targeted object (You must have WriteOwner permission on it)
     """
     old_sid = modifySecDesc(conn, identity=identity, target=target, control_flag=dtypes.OWNER_SECURITY_INFORMATION)['OwnerSid'].formatCanonical()
-    LOG.info(f'[+] Old owner {old_sid} is now replaced by {identity} on {target}')
+    LOG.info('[+] Old owner %s is now replaced by %s on %s', old_sid, identity, target)
     return old_sid
 
 
 @register_module
-def setRbcd(conn, spn, target, enable="True"):
+def setRbcd(conn, spn, target, enable=True):
     """
     Set Resource Based Constraint Delegation (RBCD) on the target to the SPN provided
     Args:
@@ -279,41 +309,44 @@ def setRbcd(conn, spn, target, enable="True"):
     """
     attr = 'msDS-AllowedToActOnBehalfOfOtherIdentity'
     modifySecDesc(conn=conn, identity=spn, target=target, ldap_attribute=attr, access_mask=ACCESS_FLAGS['ADS_RIGHT_DS_CONTROL_ACCESS'], enable=enable)
-    LOG.info(f"[+] Attribute {attr} correctly set")
+    LOG.info("[+] Attribute %s correctly set", attr)
     LOG.info('[+] Delegation rights modified successfully!')
-    if enable == "True":
-        LOG.info(f'{spn} can now impersonate users on {target} via S4U2Proxy')
+    if enable:
+        LOG.info('%s can now impersonate users on %s via S4U2Proxy', spn, target)
 
 
 @register_module
-def setDCSync(conn, identity, enable='True'):
+def setDCSync(conn, identity, enable=True):
     """
     Set the right to perform DCSync with the user provided (You must have write permission on the domain LDAP object)
     Args:
         identity: sAMAccountName, DN, GUID or SID of the user
         enable: True to add DCSync and False to remove it (default is True)
     """
-    modifySecDesc(conn=conn, identity=identity, target=getDefaultNamingContext(conn.getLdapConnection()),
+    modifySecDesc(conn=conn, identity=identity, target=conn.getDefaultNamingContext(),
     ldap_filter='(objectCategory=domain)', enable=enable, control_flag=dtypes.DACL_SECURITY_INFORMATION)
-    if enable == 'True':
-        LOG.info(f'{identity} can now DCSync')
+    if enable:
+        LOG.info('%s can now DCSync', identity)
 
         
 @register_module
-def setUserAccountControl(conn, identity, flags, enable="True"):
+def setUserAccountControl(conn, identity, flags, enable=True, current_uac=None):
     """
     Enable or disable the flags for the given user (must have a write permission on the UserAccountControl attribute of the target user)
     Args:
         identity: sAMAccountName, DN, GUID or SID of the target
         flags: hexadecimal value corresponding to flags to set (e.g for DONT_REQ PREAUTH: 0x400000)
         enable: True to add the flags or False to delete them (default is True)
+        current_uac: hexadecimal value of the current userAccountControl of the target (default is fetched from the target)
     """
-    enable = enable == "True"
     flags = int(flags,16)
-    
-    response = getObjAttr(conn, identity, 'userAccountControl')
-    LOG.info("Original userAccountControl: "+str(response['attributes']['userAccountControl']))
-    rawAccountControl = int(response['raw_attributes']['userAccountControl'][0].decode())
+
+    if current_uac is None:
+        response = getObjAttr(conn, identity, 'userAccountControl')
+        LOG.info("Original userAccountControl: %s", response['attributes']['userAccountControl'])
+        rawAccountControl = int(response['raw_attributes']['userAccountControl'][0].decode())
+    else:
+        rawAccountControl = int(current_uac,16)
 
     if enable:
         rawAccountControl = rawAccountControl | flags
@@ -5,6 +5,7 @@ import impacket
 import logging
 import json
 from ldap3.protocol.formatters.formatters import format_sid
+from ldap3.utils.conv import format_json
 from impacket.ldap import ldaptypes
 from impacket.dcerpc.v5 import samr, dtypes
 from dsinternals.system.Guid import Guid
@@ -19,6 +20,9 @@ from .formatters import ACCESS_FLAGS, ACE_FLAGS
 LOG = logging.getLogger()
 logging.basicConfig(level=logging.DEBUG, format='%(message)s')
 
+# If SACL is asked the server will not return the nTSecurityDescriptor for a standard user because it needs privileges
+_SD_CONTROL_FLAGS = dtypes.OWNER_SECURITY_INFORMATION | dtypes.GROUP_SECURITY_INFORMATION | dtypes.DACL_SECURITY_INFORMATION
+
 
 # 983551 Full control
 def createACE(sid, object_type=None, access_mask=983551):
@@ -74,13 +78,14 @@ def resolvDN(conn, identity, objtype=None):
         identity: sAMAccountName, DN, GUID or SID of the user
         objtype: None is default or GPO
     """
+    ident_low = identity.lower()
 
-    if "dc=" in identity.lower():
+    if "dc=" in ident_low:
         # identity is a DN, return as is
         # We do not try to validate it because it could be from another trusted domain
         return identity
 
-    if "s-1-" in identity.lower():
+    if "s-1-" in ident_low:
         # We assume identity is an SID
         ldap_filter = f'(objectSid={identity})'
 
@@ -95,7 +100,7 @@ def resolvDN(conn, identity, objtype=None):
         ldap_filter = f'(sAMAccountName={identity})'
 
     naming_context = getDefaultNamingContext(conn)
-    conn.search(naming_context, ldap_filter)
+    conn.search(naming_context, ldap_filter, attributes=ldap3.NO_ATTRIBUTES)
 
     entries = [e for e in conn.response if e.get('type', '') == 'searchResEntry']
 
@@ -108,7 +113,7 @@ def resolvDN(conn, identity, objtype=None):
     res = entries[0]['dn']
     return res
 
-def getObjAttr(conn, identity, attr='*', fetchSD="False", isLog=False):
+def getObjAttr(conn, identity, attr='*', fetchSD=False, isLog=False):
     """
     Fetch LDAP attributes for the identity (group or user) provided
     Args:
@@ -116,16 +121,13 @@ def getObjAttr(conn, identity, attr='*', fetchSD="False", isLog=False):
         attr: attributes to fetch separated with ',' (default fetch all attributes)
         fetchSD: True fetch nTSecurityDescriptor that contains DACL (default is False)
     """
-    ldap_conn = conn.getLdapConnection()
-    dn = resolvDN(ldap_conn, identity)
-    control_flag = 0
-    if fetchSD == "True":
-        # If SACL is asked the server will not return the nTSecurityDescriptor for a standard user because it needs privileges
-        control_flag = dtypes.OWNER_SECURITY_INFORMATION + dtypes.GROUP_SECURITY_INFORMATION + dtypes.DACL_SECURITY_INFORMATION
+    ldap_conn = conn.ldap
+    dn = conn.resolvDN(identity)
+    control_flag = _SD_CONTROL_FLAGS if fetchSD else 0
     controls = ldap3.protocol.microsoft.security_descriptor_control(sdflags=control_flag)
     ldap_conn.search(dn, "(objectClass=*)", search_scope=ldap3.BASE, attributes=attr.split(','), controls=controls)
     if isLog:
-        print(json.dumps(json.loads(conn.getLdapConnection().response_to_json())['entries'][0]['attributes'], indent=4, sort_keys=True))
+        print(json.dumps(dict(ldap_conn.response[0]['attributes']), default=format_json, indent=4, sort_keys=True))
     return ldap_conn.response[0]
 
 def setAttr(conn, identity, attribute, value):
@@ -136,8 +138,8 @@ def setAttr(conn, identity, attribute, value):
         attribute: Name of the attribute 
         value: jSON array (e.g ["john.doe"])
     """
-    ldap_conn = conn.getLdapConnection()
-    dn = resolvDN(ldap_conn, identity)
+    ldap_conn = conn.ldap
+    dn = conn.resolvDN(identity)
     ldap_conn.modify(dn, {attribute: [ldap3.MODIFY_REPLACE, value]})
 
     if ldap_conn.result['result'] == 0:
@@ -156,10 +158,16 @@ def getObjectSID(conn, identity):
     Args:
         identity: sAMAccountName, DN, GUID or SID of the object
     """
-    ldap_conn = conn.getLdapConnection()
-    object_dn = resolvDN(ldap_conn, identity)
-    ldap_conn.search(object_dn, '(objectClass=*)', search_scope=ldap3.BASE, attributes='objectSid')
-    object_sid = ldap_conn.response[0]['raw_attributes']['objectSid'][0]
+    if identity.lower().startswith("s-1-"):
+        # identity is already a SID, no need to search for it
+        sid = ldaptypes.LDAP_SID()
+        sid.fromCanonical(identity)
+        object_sid = sid.getData()
+    else:
+        ldap_conn = conn.ldap
+        object_dn = conn.resolvDN(identity)
+        ldap_conn.search(object_dn, '(objectClass=*)', search_scope=ldap3.BASE, attributes='objectSid')
+        object_sid = ldap_conn.response[0]['raw_attributes']['objectSid'][0]
     LOG.info(f'[+] {identity} SID is: {format_sid(object_sid)}')
     return object_sid
 
@@ -217,12 +225,11 @@ def rpcChangePassword(conn, target, new_pass):
 
 def modifySecDesc(conn, identity, target,
     ldap_filter='(objectClass=*)', ldap_attribute='nTSecurityDescriptor',
-    object_type=None, access_mask=ACCESS_FLAGS['GENERIC_ALL'], control_flag=None, enable="True"):
+    object_type=None, access_mask=ACCESS_FLAGS['GENERIC_ALL'], control_flag=None, enable=True):
 
-    enable = enable == "True"
-    ldap_conn = conn.getLdapConnection()
+    ldap_conn = conn.ldap
 
-    target_dn = resolvDN(ldap_conn, target)
+    target_dn = conn.resolvDN(target)
     controls=None
     if control_flag:
         controls = ldap3.protocol.microsoft.security_descriptor_control(sdflags=control_flag)
@@ -278,8 +285,8 @@ def addShadowCredentials(conn, identity, outfilePath=None):
         identity: sAMAccountName, DN, GUID or SID of the target (You must have write permission on it)
         outfilePath: file path for the generated certificate (default is current path)
     """
-    ldap_conn = conn.getLdapConnection()
-    target_dn = resolvDN(ldap_conn, identity)
+    ldap_conn = conn.ldap
+    target_dn = conn.resolvDN(identity)
 
     LOG.debug("Generating certificate")
     certificate = X509Certificate2(subject=identity, keySize=2048, notBefore=(-40 * 365), notAfter=(40 * 365))